@@ -9,29 +9,66 @@ to determine block types and data formats.
 Author: NohrTech AS
 """
 
-import struct
-from collections import Counter
+import os
+import mmap
 import binascii
+import numpy as np
+
+def _scan_block_headers(data, sync_positions):
+    """Read the ID/Length header word of every block in one pass.
+
+    Returns (positions, id_length) arrays restricted to sync markers that
+    have a complete header inside the buffer.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    positions = np.asarray(sync_positions, dtype=np.int64)
+    positions = positions[positions + 6 <= len(buf)]
+    start = positions + 4  # Skip sync bytes and CRC
+    id_length = buf[start].astype(np.uint16) | (buf[start + 1].astype(np.uint16) << 8)
+    return positions, id_length
+
+def _most_common_distances(distances, n):
+    """Return the n most common values in distances as (value, count) pairs."""
+    if distances.max() <= max(len(distances), 1 << 16):
+        # Narrow range: a dense histogram is a single pass
+        counts = np.bincount(distances)
+        values = np.arange(len(counts))
+    else:
+        # Wide range: only count the values that actually occur
+        values, counts = np.unique(distances, return_counts=True)
+    k = min(n, len(counts))
+    idx = np.argpartition(counts, -k)[-k:]
+    return sorted(((int(values[i]), int(counts[i])) for i in idx if counts[i]),
+                  key=lambda item: item[1], reverse=True)
 
 def analyze_sbf(filename):
-    block_ids = Counter()
-    block_lengths = Counter()
-    sync_positions = []
-    last_pos = 0
-    
     with open(filename, 'rb') as f:
-        data = f.read()
-        
+        if os.fstat(f.fileno()).st_size == 0:
+            _analyze_data(b'')
+            return
+        # Map the file instead of reading it so large logs are paged in on demand
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            _analyze_data(data)
+
+def _analyze_data(data):
     # Find all sync markers
     print("\nAnalyzing sync markers...")
-    sync_positions = [i for i in range(len(data)-1) if data[i:i+2] == b'$@']
+    sync_positions = []
+    find = data.find
+    pos = find(b'$@')
+    while pos >= 0:
+        sync_positions.append(pos)
+        pos = find(b'$@', pos + 1)
     if sync_positions:
         print(f"Found {len(sync_positions)} potential sync markers")
         
         # Analyze distances between sync markers
-        distances = [sync_positions[i+1] - sync_positions[i] for i in range(len(sync_positions)-1)]
-        if distances:
-            print(f"Most common distances between sync markers: {Counter(distances).most_common(3)}")
+        distances = np.diff(np.asarray(sync_positions, dtype=np.int64))
+        if len(distances):
+            most_common = _most_common_distances(distances, 3)
+            print(f"Most common distances between sync markers: {most_common}")
     else:
         print("No standard sync markers found")
         
@@ -44,8 +81,8 @@ def analyze_sbf(filename):
             
             # Read potential header fields
             if block_start + 8 <= len(data):
-                crc = struct.unpack('<H', data[block_start:block_start+2])[0]
-                id_length = struct.unpack('<H', data[block_start+2:block_start+4])[0]
+                crc = data[block_start] | (data[block_start+1] << 8)
+                id_length = data[block_start+2] | (data[block_start+3] << 8)
                 next_bytes = data[block_start+4:block_start+8]
                 
                 print(f"\nBlock at position {pos}:")
@@ -70,6 +107,15 @@ def analyze_sbf(filename):
         except Exception as e:
             print(f"Error analyzing block at {pos}: {str(e)}")
     
+    # Summarize the header of every block, not just the sampled ones
+    if sync_positions:
+        positions, id_length = _scan_block_headers(data, sync_positions)
+        block_ids, id_counts = np.unique(id_length & 0x1FFF, return_counts=True)
+        order = np.argsort(id_counts)[::-1]
+        print(f"\nBlock ID summary ({len(positions)} blocks):")
+        for i in order[:10]:
+            print(f"  ID 0x{int(block_ids[i]):04x}: {int(id_counts[i])} blocks")
+
     print("\nFile analysis complete")
 
 if __name__ == "__main__":
@@ -12,28 +12,78 @@ Author: NohrTech
 from flask import Flask, render_template, request, jsonify, send_file, session
 from flask_session import Session
 import os
-from werkzeug.utils import secure_filename
-from nohrtech_sigma import NohrTechSigmaCalculator
+import io
+import gzip
+import hashlib
+import re
+from nohrtech_sigma import run_calculation, run_comparison
 from pdf_generator import generate_pdf
 import tempfile
+import numpy as np
 import uuid
 import logging
 from datetime import datetime
 import shutil
 import time
+import multiprocessing
 import threading
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s: %(message)s',
-    handlers=[
-        logging.FileHandler('logs/app.log'),
-        logging.StreamHandler()
-    ]
-)
+import queue
+import atexit
+import logging.handlers
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Configure logging. Request threads only put records on a queue; a listener
+# thread in each serving process does the formatting and the file/console writes.
+log_queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+# When this file is run directly (python app.py), calculation worker
+# processes import it again as __mp_main__; they must not start the
+# server's logging and cleanup threads.
+IS_SERVER_PROCESS = multiprocessing.parent_process() is None
+if IS_SERVER_PROCESS:
+    logging.basicConfig(
+        level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s %(levelname)s: %(message)s',
+        handlers=[log_queue_handler]
+    )
 logger = logging.getLogger(__name__)
 
+_log_listener = None
+_log_listener_pid = None
+
+def start_log_listener(log_file=True):
+    """Start the thread that writes queued log records, once per process.
+
+    Records go to the console and, if log_file is set, to logs/app.log.
+    Threads do not survive fork, so forked server workers call this again
+    (see post_fork in gunicorn.conf.py). Only one process may write the
+    rotating log file, since each would rotate it on its own.
+    """
+    global _log_listener, _log_listener_pid
+    if _log_listener_pid == os.getpid():
+        return
+    if _log_listener_pid is not None:
+        # Records already queued in the parent are written by the parent
+        log_queue_handler.queue = queue.Queue(-1)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            'logs/app.log', maxBytes=10 * 1024 * 1024, backupCount=5))
+    _log_listener = logging.handlers.QueueListener(log_queue_handler.queue, *handlers)
+    _log_listener.start()
+    _log_listener_pid = os.getpid()
+
+def stop_log_listener():
+    """Flush queued log records on shutdown."""
+    if _log_listener_pid == os.getpid():
+        _log_listener.stop()
+
+if IS_SERVER_PROCESS:
+    # The Gunicorn master (see gunicorn.conf.py) leaves the log file to its worker
+    start_log_listener(log_file=os.environ.get('SIGMA_LOG_FILE', '1') == '1')
+    atexit.register(stop_log_listener)
+
 app = Flask(__name__)
 app.config.update(
     UPLOAD_FOLDER=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'),
@@ -41,7 +91,15 @@ app.config.update(
     SECRET_KEY='nohrtech-sigma-calculator-secret-key',
     SESSION_TYPE='filesystem',
     SESSION_FILE_DIR=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_session'),
-    MAX_RESULTS_PER_SESSION=10
+    MAX_RESULTS_PER_SESSION=10,
+    MAX_STORED_RESULTS=100,
+    MAX_STORED_EPOCHS=1_000_000,  # Total epochs kept across all stored results
+    CALCULATION_WORKERS=os.cpu_count(),
+    # Let the front-end web server send PDFs (requires mod_xsendfile / X-Accel-Redirect)
+    USE_X_SENDFILE=os.environ.get('SIGMA_USE_X_SENDFILE') == '1',
+    CALCULATION_CACHE_EPOCHS=500_000,
+    COMPRESS_MIN_SIZE=4096,  # Only gzip JSON responses larger than this (bytes)
+    COMPRESS_LEVEL=1
 )
 
 # Ensure directories exist
@@ -52,10 +110,226 @@ for directory in [app.config['UPLOAD_FOLDER'], app.config['SESSION_FILE_DIR']]:
 # Initialize Flask-Session
 Session(app)
 
+UPLOAD_BUFFER_SIZE = 1 << 20  # 1MB copy buffer for uploads
+ALLOWED_EXTENSIONS = frozenset(('rnx', 'obs', 'sbf', 'xyz', 'llh'))
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._-]')
+
+class ResultStore:
+    """Thread-safe in-memory LRU store for calculation results.
+
+    Results are kept in process memory instead of being pickled into the
+    session on every request; the session only carries the result IDs.
+    The store holds at most maxsize entries and, if sizeof is given, at most
+    maxweight in total of sizeof(value) over all entries.
+    """
+    def __init__(self, maxsize, maxweight=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.sizeof = sizeof
+        self._items = OrderedDict()
+        self._weights = {}
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __getitem__(self, key):
+        with self._lock:
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def __setitem__(self, key, value):
+        weight = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._weight += weight - self._weights.get(key, 0)
+            self._items[key] = value
+            self._weights[key] = weight
+            self._items.move_to_end(key)
+            # The newest entry is always kept, even if it alone exceeds maxweight
+            while len(self._items) > 1 and (
+                    len(self._items) > self.maxsize
+                    or (self.maxweight is not None and self._weight > self.maxweight)):
+                old_key, _ = self._items.popitem(last=False)
+                self._weight -= self._weights.pop(old_key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+def count_epochs(results):
+    """Weigh stored results by their number of epochs, which dominates their memory use."""
+    return len(results['epochs'])
+
+# Result storage shared by all sessions
+result_store = ResultStore(app.config['MAX_STORED_RESULTS'],
+                           app.config['MAX_STORED_EPOCHS'], count_epochs)
+# Processed results keyed by upload content, so re-uploads skip the calculation
+calculation_cache = ResultStore(app.config['MAX_STORED_RESULTS'],
+                                app.config['CALCULATION_CACHE_EPOCHS'], count_epochs)
+app.comparison_results = ResultStore(app.config['MAX_STORED_RESULTS'])
+
+EPOCH_COMPONENTS = ['horizontal', 'vertical', 'E', 'N', 'U']
+
+# forkserver is not available on every platform (e.g. Windows)
+CALCULATION_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the process pool used for file calculations.
+
+    The pool is created lazily so each server process (e.g. every forked
+    Gunicorn worker) gets its own. Its workers are started from a clean
+    forkserver process instead of being forked from this threaded server,
+    and only import nohrtech_sigma, not this module with its logging and
+    cleanup threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=app.config['CALCULATION_WORKERS'],
+                                            mp_context=CALCULATION_MP_CONTEXT)
+        return _executor
+
+def run_in_executor(fn, *args):
+    """Run fn(*args) in the process pool and return its result.
+
+    If a worker process died (e.g. killed for running out of memory), the
+    pool is unusable from then on; it is replaced and the call retried once.
+    """
+    global _executor
+    executor = get_executor()
+    try:
+        return executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        logger.error("Calculation process pool is broken, starting a new one")
+        with _executor_lock:
+            # Another request may already have replaced it
+            if _executor is executor:
+                _executor = None
+        executor.shutdown(wait=False)
+        return get_executor().submit(fn, *args).result()
+
+def calculation_cache_key(path):
+    """Return a cache key for a saved upload based on its extension and content hash."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_BUFFER_SIZE), b''):
+            digest.update(chunk)
+    # The extension is part of the key since it selects the parser (e.g. .xyz vs .llh)
+    return os.path.splitext(path)[1].lower() + ':' + digest.hexdigest()
+
+def process_file(path):
+    """Calculate sigma values for a saved upload and prepare them for display.
+
+    Returns None if the file contains no position data.
+    """
+    # Process the file in a worker process so CPU-bound parsing scales across cores
+    results = run_in_executor(run_calculation, path)
+    if results is None:
+        return None
+
+    # Convert epoch timestamps to strings if they aren't already
+    times = format_epoch_times(results.pop('times'))
+
+    # Round numerical values to 3 decimal places, one column at a time. Only
+    # the per-epoch dicts are kept; the columns are not used after this.
+    columns = [np.round(results.pop(key), 3).tolist() for key in EPOCH_COMPONENTS]
+    results['epochs'] = [
+        {'time': t, 'horizontal': h, 'vertical': v, 'E': e, 'N': n, 'U': u}
+        for t, h, v, e, n, u in zip(times, *columns)
+    ]
+
+    # Round summary statistics to 3 decimal places
+    for comp in results['summary']:
+        for stat in ['mean', 'min', 'max', 'std']:
+            results['summary'][comp][stat] = round(results['summary'][comp][stat], 3)
+
+    return results
+
+def format_epoch_times(times):
+    """Format datetime epoch times as 'YYYY/MM/DD HH:MM:SS.ffffff' strings.
+
+    All epochs of a file share one type, so datetimes are converted in a
+    single vectorized call; other values (e.g. strings) are returned as is.
+    """
+    if not times or not isinstance(times[0], datetime):
+        return list(times)
+    iso = np.datetime_as_string(np.array(times, dtype='datetime64[us]'), unit='us')
+    return np.char.replace(np.char.replace(iso, '-', '/'), 'T', ' ').tolist()
+
+def save_upload(file, path):
+    """Write an uploaded file to path in a single copy.
+
+    Large uploads are spooled by Werkzeug to a real temporary file, which is
+    transferred in-kernel with os.sendfile. Small uploads still held in memory
+    fall back to a buffered copy.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb', buffering=UPLOAD_BUFFER_SIZE) as dst:
+        src = file.stream
+        src_fd = None
+        # SpooledTemporaryFile.fileno() would first write an in-memory upload
+        # out to disk, so only ask for a descriptor once it has rolled over.
+        # _rolled is private; should it ever go away, assume the data is on
+        # disk, which at worst costs that extra write.
+        if not isinstance(src, tempfile.SpooledTemporaryFile) or getattr(src, '_rolled', True):
+            try:
+                src_fd = src.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                src_fd = None
+
+        if src_fd is not None and hasattr(os, 'sendfile'):
+            offset = src.tell()
+            size = os.fstat(src_fd).st_size
+            while offset < size:
+                sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        else:
+            shutil.copyfileobj(src, dst, length=UPLOAD_BUFFER_SIZE)
+
+def safe_filename(filename):
+    """Return an ASCII-only version of filename that is safe to join to a directory.
+
+    Every character outside [A-Za-z0-9._-] is replaced, so no path separators
+    survive, and leading dots are stripped so the result can't be '.' or '..'.
+    """
+    name = _UNSAFE_FILENAME_CHARS.sub('_', filename)[-128:].lstrip('.')
+    return name or 'upload'
+
 def allowed_file(filename):
     """Check if the file has an allowed extension."""
-    ALLOWED_EXTENSIONS = {'.rnx', '.obs', '.sbf', '.xyz', '.llh'}
-    return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
+    stem, dot, ext = filename.rpartition('.')
+    # A bare extension such as '.llh' has no name to save the upload under
+    return bool(dot) and bool(stem) and ext.lower() in ALLOWED_EXTENSIONS
+
+@app.after_request
+def compress_response(response):
+    """Gzip large JSON responses (e.g. epoch data) for clients that accept it."""
+    if (response.status_code != 200
+            or response.mimetype != 'application/json'
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.accept_encodings):
+        return response
+
+    data = response.get_data()
+    if len(data) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=app.config['COMPRESS_LEVEL']))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route('/')
 def index():
@@ -72,17 +346,17 @@ def disclaimer():
 @app.route('/view_results/<result_id>')
 def view_results(result_id):
     logger.debug(f"Accessing results with ID: {result_id}")
-    logger.debug(f"Session contents: {session.get('results', {}).keys()}")
+    logger.debug(f"Session result IDs: {session.get('result_ids', [])}")
     
-    if 'results' not in session:
-        logger.error("No results found in session")
+    if result_id not in session.get('result_ids', []):
+        logger.error(f"Result ID {result_id} not found in session")
         return "Results not found", 404
     
-    if result_id not in session['results']:
-        logger.error(f"Result ID {result_id} not found in session results")
+    results = result_store.get(result_id)
+    if results is None:
+        logger.error(f"Result ID {result_id} has expired from the result store")
         return "Results not found", 404
     
-    results = session['results'][result_id]
     logger.debug(f"Found results for ID {result_id}: {results.get('filename')}")
     return render_template('results.html', 
                          results=results, 
@@ -100,52 +374,34 @@ def calculate():
     if not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file type. Supported types: .rnx, .obs, .sbf, .xyz, .llh'}), 400
 
+    # Requests are handled concurrently, so every upload gets its own path
+    temp_dir = app.config['UPLOAD_FOLDER']
+    temp_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}_{safe_filename(file.filename)}")
     try:
         # Save uploaded file to temporary location
-        temp_dir = app.config['UPLOAD_FOLDER']
-        temp_path = os.path.join(temp_dir, secure_filename(file.filename))
-        file.save(temp_path)
-        
-        # Process the file
-        calculator = NohrTechSigmaCalculator(temp_path)
-        calculator.read_file()
-        results = calculator.calculate_sigma()
-        
-        if results is None:
-            return jsonify({'error': 'No position data found in file'}), 400
-
-        # Convert epoch timestamps to strings if they aren't already
-        for epoch in results['epochs']:
-            if isinstance(epoch['time'], datetime):
-                epoch['time'] = epoch['time'].strftime('%Y/%m/%d %H:%M:%S.%f')
-            # Round numerical values to 3 decimal places
-            for key in ['horizontal', 'vertical', 'E', 'N', 'U']:
-                epoch[key] = round(epoch[key], 3)
-        
-        # Round summary statistics to 3 decimal places
-        for comp in results['summary']:
-            for stat in ['mean', 'min', 'max', 'std']:
-                results['summary'][comp][stat] = round(results['summary'][comp][stat], 3)
+        save_upload(file, temp_path)
         
-        # Store results in session
-        if 'results' not in session:
-            session['results'] = {}
-            
-        # Clean up old results if we've reached the maximum
-        if len(session['results']) >= app.config['MAX_RESULTS_PER_SESSION']:
-            oldest_key = next(iter(session['results']))
-            del session['results'][oldest_key]
+        # Reuse the results of an identical earlier upload if we have them
+        cache_key = calculation_cache_key(temp_path)
+        cached = calculation_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Using cached results for {file.filename}")
+            results = dict(cached)
+        else:
+            results = process_file(temp_path)
+            if results is None:
+                return jsonify({'error': 'No position data found in file'}), 400
+            calculation_cache[cache_key] = dict(results)
         
         # Generate unique ID for these results
         result_id = str(uuid.uuid4())
         
-        # Store results with filename
+        # Store results with filename; the session only tracks the IDs
         results['filename'] = file.filename
-        session['results'][result_id] = results
-        session.modified = True
-
-        # Clean up temporary file
-        os.remove(temp_path)
+        result_store[result_id] = results
+        result_ids = session.get('result_ids', [])
+        result_ids.append(result_id)
+        session['result_ids'] = result_ids[-app.config['MAX_RESULTS_PER_SESSION']:]
         
         return jsonify({
             'result_id': result_id,
@@ -158,6 +414,15 @@ def calculate():
         logger.error(f"Error processing file: {str(e)}")
         return jsonify({'error': f'Error processing file: {str(e)}'}), 500
 
+    finally:
+        # Clean up temporary file
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error removing temporary file {temp_path}: {str(e)}")
+
 @app.route('/compare', methods=['POST'])
 def compare_files():
     if 'file1' not in request.files or 'file2' not in request.files:
@@ -169,26 +434,26 @@ def compare_files():
     if file1.filename == '' or file2.filename == '':
         return jsonify({'error': 'Please select two files'}), 400
     
-    temp_dir = None
+    # Save files temporarily; the directory is removed in one go afterwards
+    temp_dir = tempfile.mkdtemp()
     try:
-        # Save files temporarily
-        temp_dir = tempfile.mkdtemp()
-        file1_path = os.path.join(temp_dir, secure_filename(file1.filename))
-        file2_path = os.path.join(temp_dir, secure_filename(file2.filename))
+        # Prefix the names so two uploads with the same filename don't collide
+        file1_path = os.path.join(temp_dir, '1_' + safe_filename(file1.filename))
+        file2_path = os.path.join(temp_dir, '2_' + safe_filename(file2.filename))
         
         app.logger.info(f"Processing files for comparison:")
         app.logger.info(f"File 1: {file1.filename} -> {file1_path}")
         app.logger.info(f"File 2: {file2.filename} -> {file2_path}")
         
-        file1.save(file1_path)
-        file2.save(file2_path)
-        
-        # Process files
-        calculator1 = NohrTechSigmaCalculator(file1_path)
-        calculator2 = NohrTechSigmaCalculator(file2_path)
+        # Write both uploads to disk concurrently
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            saves = [executor.submit(save_upload, file1, file1_path),
+                     executor.submit(save_upload, file2, file2_path)]
+            for future in saves:
+                future.result()
         
-        # Get comparison results
-        comparison_results = calculator1.compare_with(calculator2)
+        # Process files and get comparison results in a worker process
+        comparison_results = run_in_executor(run_comparison, file1_path, file2_path)
         
         if comparison_results is None:
             app.logger.error("Failed to generate comparison results")
@@ -219,12 +484,14 @@ def compare_files():
         
     finally:
         # Clean up temporary files
-        if temp_dir and os.path.exists(temp_dir):
-            try:
-                shutil.rmtree(temp_dir)
-                app.logger.info(f"Cleaned up temporary directory: {temp_dir}")
-            except Exception as e:
-                app.logger.error(f"Error cleaning up temporary directory: {str(e)}")
+        def log_cleanup_error(function, path, exc_info):
+            app.logger.error(f"Error cleaning up temporary directory: {path}: {str(exc_info[1])}")
+
+        shutil.rmtree(temp_dir, onerror=log_cleanup_error)
+        if os.path.exists(temp_dir):
+            app.logger.error(f"Temporary directory was not fully removed: {temp_dir}")
+        else:
+            app.logger.info(f"Cleaned up temporary directory: {temp_dir}")
 
 @app.route('/view_comparison/<result_id>')
 def view_comparison(result_id):
@@ -256,11 +523,13 @@ def generate_pdf_route():
             download_name=pdf_filename
         )
 
-        # Clean up PDF file after sending
-        @response.call_on_close
-        def cleanup():
-            if os.path.exists(pdf_path):
-                os.remove(pdf_path)
+        # With X-Sendfile the web server reads the PDF after this response is
+        # closed, so leave it for the periodic cleanup in that case
+        if not app.config['USE_X_SENDFILE']:
+            @response.call_on_close
+            def cleanup():
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
 
         return response
 
@@ -282,16 +551,18 @@ def cleanup_old_files():
     def remove_old_files(directory, file_type):
         """Remove files older than max_age from directory."""
         try:
-            for item in os.listdir(directory):
-                item_path = os.path.join(directory, item)
-                if os.path.isfile(item_path):
-                    # Check if file is older than max_age
-                    if current_time - os.path.getmtime(item_path) > max_age:
-                        try:
-                            os.remove(item_path)
-                            logger.info(f"Removed old {file_type}: {item}")
-                        except OSError as e:
-                            logger.error(f"Error removing {item_path}: {e}")
+            # scandir entries carry cached stat info, avoiding extra syscalls per file
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    try:
+                        # Check if file is older than max_age
+                        if current_time - entry.stat().st_mtime > max_age:
+                            os.remove(entry.path)
+                            logger.info(f"Removed old {file_type}: {entry.name}")
+                    except OSError as e:
+                        logger.error(f"Error removing {entry.path}: {e}")
         except OSError as e:
             logger.error(f"Error accessing {directory}: {e}")
 
@@ -326,8 +597,9 @@ def initialize_app():
         cleanup_thread.start()
 
 # Use with_app_context for initialization
-with app.app_context():
-    initialize_app()
+if IS_SERVER_PROCESS:
+    with app.app_context():
+        initialize_app()
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,35 @@
+"""
+NohrTech Sigma Calculator - Gunicorn Configuration
+A professional GNSS position accuracy analysis tool by NohrTech.
+
+Production server settings used by the systemd service created in install.sh.
+
+Author: NohrTech
+"""
+
+import os
+
+bind = '127.0.0.1:8000'
+
+# Results are kept in process memory, so a single worker serves all requests.
+# Requests are handled concurrently by threads, and the CPU-bound file
+# calculations run in the app's process pool, which scales across cores.
+workers = 1
+worker_class = 'gthread'
+threads = int(os.environ.get('SIGMA_GUNICORN_THREADS', 4))
+
+# Import the app once in the master; this also means the hourly cleanup
+# thread runs exactly once instead of once per worker.
+preload_app = True
+
+# The master logs to the console only; the worker writes logs/app.log, so
+# the rotating log file has a single writer.
+os.environ['SIGMA_LOG_FILE'] = '0'
+
+# Large SBF/RINEX files can take a while to process
+timeout = 120
+
+def post_fork(server, worker):
+    """Start the app's log writer thread in the new worker process."""
+    import app
+    app.start_log_listener(log_file=True)
@@ -266,13 +266,11 @@ ExecStart=/bin/bash -c '\
     source $APP_DIR/venv/bin/activate && \
     exec gunicorn \
     --chdir $APP_DIR \
-    --bind 127.0.0.1:8000 \
-    --workers 1 \
+    --config $APP_DIR/gunicorn.conf.py \
     --log-level debug \
     --error-logfile $APP_DIR/logs/gunicorn-error.log \
     --access-logfile $APP_DIR/logs/gunicorn-access.log \
     --capture-output \
-    --preload \
     app:app'
 
 # Restart settings
@@ -347,8 +345,7 @@ echo "Running test with gunicorn directly..."
 source "$APP_DIR/venv/bin/activate"
 gunicorn \
     --chdir "$APP_DIR" \
-    --bind 127.0.0.1:8000 \
-    --workers 1 \
+    --config "$APP_DIR/gunicorn.conf.py" \
     --log-level debug \
     --error-logfile "$APP_DIR/logs/gunicorn-error.log" \
     --access-logfile "$APP_DIR/logs/gunicorn-access.log" \
@@ -13,21 +13,78 @@ Author: NohrTech
 """
 
 import os
-import math
+import re
+import mmap
+import warnings
 import argparse
+import glob
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple, Optional
 import struct
 from datetime import datetime
 from sbf_parser import SBFParser
 import numpy as np
 
+# RINEX 3 epoch line: fixed-width year, month, day, hour, minute, whole seconds
+# and (when present) the number of satellites in columns 32-34
+_EPOCH_LINE = re.compile(rb'>.(.{4}).(.{2}).(.{2}).(.{2}).(.{2}).(.{2})(?:.{11}(.{3}))?')
+
+class EpochResults(Sequence):
+    """Per-epoch results stored as one array per component.
+
+    Behaves like the list of epoch dicts it replaces: indexing or iterating
+    builds {'time', 'horizontal', 'vertical', 'E', 'N', 'U'} dicts on demand,
+    while the columns stay available as arrays for bulk processing.
+    """
+    COMPONENTS = ('horizontal', 'vertical', 'E', 'N', 'U')
+
+    def __init__(self, times, horizontal, vertical, E, N, U):
+        self.times = times
+        self.horizontal = horizontal
+        self.vertical = vertical
+        self.E = E
+        self.N = N
+        self.U = U
+
+    def columns(self):
+        """Return the component arrays in COMPONENTS order."""
+        return self.horizontal, self.vertical, self.E, self.N, self.U
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return {
+            'time': self.times[index],
+            'horizontal': self.horizontal[index],
+            'vertical': self.vertical[index],
+            'E': self.E[index],
+            'N': self.N[index],
+            'U': self.U[index]
+        }
+
+    def __iter__(self):
+        for time, h, v, e, n, u in zip(self.times, *self.columns()):
+            yield {'time': time, 'horizontal': h, 'vertical': v, 'E': e, 'N': n, 'U': u}
+
 class NohrTechSigmaCalculator:
     """Main calculator class for GNSS position accuracy analysis."""
-    def __init__(self, filename: str):
-        """Initialize the calculator with the observation file."""
+    def __init__(self, filename: str, keep_observations: bool = False):
+        """Initialize the calculator with the observation file.
+
+        RINEX satellite observations are only parsed and kept in
+        self.observations when keep_observations is set; the sigma
+        calculation does not use them.
+        """
         self.filename = filename
         self.file_format = self._determine_file_format()
+        self.keep_observations = keep_observations
         self.observations = []  # List of epoch observations
+        self._cached_results = None  # calculate_sigma results for the data read so far
         self.sigma_values = {
             'epochs': [],  # List of epoch timestamps
             'E': [],      # East component sigmas
@@ -47,12 +104,30 @@ class NohrTechSigmaCalculator:
         else:
             raise ValueError(f"Unsupported file format: {ext}")
 
-    def read_file(self):
-        """Read the observation file based on its format."""
+    def read_file(self, use_cache=False):
+        """Read the observation file based on its format.
+
+        With use_cache, the parsed sigma values are saved to a '.sigma.npz'
+        file next to the input and reused on later runs as long as the
+        input's size and modification time are unchanged. Raw RINEX
+        observations are not cached.
+        """
         if not os.path.exists(self.filename):
             raise FileNotFoundError(f"File not found: {self.filename}")
         
-        file_format = self._determine_file_format()
+        self._cached_results = None
+        if use_cache:
+            cache_path = self.filename + '.sigma.npz'
+            stat = os.stat(self.filename)
+            cache_key = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+            if self._load_cache(cache_path, cache_key):
+                return
+        
+        # Start from empty values so reading the file again does not duplicate them
+        self.observations = []
+        self.sigma_values = {'epochs': [], 'E': [], 'N': [], 'U': []}
+        
+        file_format = self.file_format
         if file_format == 'RINEX':
             self._read_rinex_file()
         elif file_format == 'SBF':
@@ -61,81 +136,174 @@ class NohrTechSigmaCalculator:
             self._read_xyz_file()
         else:
             raise ValueError(f"Unsupported file format: {file_format}")
+        
+        # Readers that collect values in lists hand them over as arrays, so the
+        # calculations below never have to convert them again
+        for comp in ('E', 'N', 'U'):
+            self.sigma_values[comp] = np.asarray(self.sigma_values[comp], dtype=np.float64)
+        
+        if use_cache:
+            self._save_cache(cache_path, cache_key)
+
+    def _load_cache(self, cache_path, cache_key):
+        """Load sigma values from a cache file if it matches cache_key."""
+        try:
+            with np.load(cache_path) as cache:
+                if not np.array_equal(cache['key'], cache_key):
+                    return False
+                epochs = cache['epochs']
+                # Datetime epochs (RINEX, SBF) are stored as datetime64, text epochs (XYZ/LLH) as strings
+                if epochs.dtype.kind == 'M':
+                    epochs = epochs.astype(object)
+                self.sigma_values = {
+                    'epochs': epochs.tolist(),
+                    'E': cache['E'],
+                    'N': cache['N'],
+                    'U': cache['U']
+                }
+        except Exception:
+            # A missing, truncated or otherwise unreadable cache is just a miss
+            return False
+        return True
+
+    def _save_cache(self, cache_path, cache_key):
+        """Save the parsed sigma values to a cache file."""
+        epochs = self.sigma_values['epochs']
+        if epochs and isinstance(epochs[0], datetime):
+            epochs = np.array(epochs, dtype='datetime64[us]')
+        else:
+            epochs = np.array(epochs, dtype=str)
+        # Write to a temporary file and rename it into place, so readers
+        # (e.g. a concurrent run) never see a partially written cache
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_path)),
+                                            suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, key=cache_key, epochs=epochs,
+                         E=self.sigma_values['E'],
+                         N=self.sigma_values['N'],
+                         U=self.sigma_values['U'])
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Warning: Could not write cache file {cache_path}: {str(e)}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
 
     def _read_rinex_file(self):
         """Read and parse RINEX observation file."""
-        with open(self.filename, 'r') as f:
-            header_end = False
-            current_epoch = None
-            approx_position = None
+        with open(self.filename, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            # Scan the mapped file as bytes; only the lines that are kept get decoded
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                approx_position, body_start = self._read_rinex_header(data)
+                if approx_position:
+                    # Convert XYZ to sigma values (using nominal accuracy)
+                    nominal_accuracy = 10.0  # 10 meters nominal accuracy
+                    self.sigma_values['epochs'].append(datetime.now())
+                    self.sigma_values['E'].append(nominal_accuracy)
+                    self.sigma_values['N'].append(nominal_accuracy)
+                    self.sigma_values['U'].append(nominal_accuracy * 1.5)  # Vertical typically less accurate
+                # The sigma values come from the header alone; the epochs are
+                # only parsed when the observations are kept
+                if self.keep_observations:
+                    self.observations.extend(self._iter_rinex_epochs(data, body_start, approx_position))
+
+    def _read_rinex_header(self, data):
+        """Read the RINEX header from a bytes-like buffer.
+
+        Returns the APPROX POSITION XYZ as an {'X', 'Y', 'Z'} dict (None if
+        missing) and the offset of the first line after END OF HEADER.
+        """
+        approx_position = None
+        
+        size = len(data)
+        pos = 0
+        while pos < size:
+            nl = data.find(b'\n', pos)
+            if nl < 0:
+                nl = size
+            line = data[pos:nl]
+            pos = nl + 1
             
-            for line in f:
-                if not header_end:
-                    if "APPROX POSITION XYZ" in line:
-                        # Extract approximate position from header
-                        try:
-                            x = float(line[0:14])
-                            y = float(line[14:28])
-                            z = float(line[28:42])
-                            approx_position = {'X': x, 'Y': y, 'Z': z}
-                            
-                            # Convert XYZ to sigma values (using nominal accuracy)
-                            nominal_accuracy = 10.0  # 10 meters nominal accuracy
-                            self.sigma_values['epochs'].append(datetime.now())
-                            self.sigma_values['E'].append(nominal_accuracy)
-                            self.sigma_values['N'].append(nominal_accuracy)
-                            self.sigma_values['U'].append(nominal_accuracy * 1.5)  # Vertical typically less accurate
-                            
-                        except ValueError:
-                            print("Warning: Could not parse approximate position")
-                    
-                    if "END OF HEADER" in line:
-                        header_end = True
-                    continue
+            # Header labels occupy columns 61-80
+            label = line[60:80]
+            if label.startswith(b"APPROX POSITION XYZ"):
+                # Extract approximate position from header
+                try:
+                    x = float(line[0:14])
+                    y = float(line[14:28])
+                    z = float(line[28:42])
+                    approx_position = {'X': x, 'Y': y, 'Z': z}
+                except ValueError:
+                    print("Warning: Could not parse approximate position")
+            
+            if label.startswith(b"END OF HEADER"):
+                break
+        return approx_position, pos
+
+    def _iter_rinex_epochs(self, data, pos, approx_position=None):
+        """Parse RINEX observation data from a bytes-like buffer, yielding one epoch at a time.
 
-                # Parse epoch line
-                if line[0] == '>':
-                    if current_epoch:
-                        self.observations.append(current_epoch)
+        Parsing starts at offset pos, the end of the header (see
+        _read_rinex_header); approx_position is attached to every epoch.
+        """
+        current_epoch = None
+        
+        size = len(data)
+        while pos < size:
+            nl = data.find(b'\n', pos)
+            if nl < 0:
+                nl = size
+            line = data[pos:nl]
+            pos = nl + 1
+            
+            # Parse epoch line
+            if line.startswith(b'>'):
+                if current_epoch:
+                    yield current_epoch
+                
+                # Parse epoch timestamp
+                try:
+                    match = _EPOCH_LINE.match(line)
+                    if match is None:
+                        raise ValueError("Malformed epoch line")
+                    year, month, day, hour, minute, second, num_sats = match.groups()
                     
-                    # Parse epoch timestamp
-                    try:
-                        year = int(line[2:6])
-                        month = int(line[7:9])
-                        day = int(line[10:12])
-                        hour = int(line[13:15])
-                        minute = int(line[16:18])
-                        second = float(line[19:21])
-                        
-                        current_epoch = {
-                            'time': datetime(year, month, day, hour, minute, int(second)),
-                            'sats': {}
-                        }
+                    current_epoch = {
+                        'time': datetime(int(year), int(month), int(day), int(hour), int(minute),
+                                         int(float(second))),
+                        'sats': {}
+                    }
+                    
+                    # Add position data for this epoch
+                    if approx_position:
+                        current_epoch['position'] = approx_position
                         
-                        # Add position data for this epoch
-                        if approx_position:
-                            current_epoch['position'] = approx_position
-                            
-                        num_sats = int(line[32:35])
-                    except (ValueError, IndexError):
-                        continue
+                    num_sats = int(num_sats or b'')
+                except (ValueError, IndexError):
+                    continue
 
-                # Parse observation data
-                if current_epoch is not None:
-                    prn = line[0:3].strip()
-                    if not prn:  # Skip empty lines
-                        continue
-                        
-                    # Store satellite observations
-                    # Note: We're not calculating position from observations yet
-                    # This would require implementing a full GNSS positioning algorithm
-                    current_epoch['sats'][prn] = {
-                        'obs': line.strip()
-                    }
+            # Parse observation data
+            if current_epoch is not None:
+                prn = line[0:3].strip()
+                if not prn:  # Skip empty lines
+                    continue
+                    
+                # Store satellite observations
+                # Note: We're not calculating position from observations yet
+                # This would require implementing a full GNSS positioning algorithm
+                current_epoch['sats'][prn.decode('ascii', 'replace')] = {
+                    'obs': line.strip().decode('ascii', 'replace')
+                }
 
-            # Add last epoch
-            if current_epoch:
-                self.observations.append(current_epoch)
+        # Add last epoch
+        if current_epoch:
+            yield current_epoch
 
     def _read_xyz_file(self, file_path=None):
         """Read and parse Emlid XYZ or LLH solution file and extract sigma values.
@@ -161,6 +329,34 @@ class NohrTechSigmaCalculator:
         # Case-insensitive check for .llh extension
         is_llh = os.path.splitext(file_path)[1].lower() == '.llh'
         
+        # For LLH files: Time LAT LON HEIGHT Q NS sE sN sU dE dN dU AGE AR
+        # sE, sN, sU are at indices 6, 7, 8 (0-based); for XYZ files they are in columns 7, 8, 9
+        sigma_columns = (6, 7, 8) if is_llh else (7, 8, 9)
+        
+        # Fast path: load the timestamp and sigma columns of the whole file in one call.
+        # Column 9 is always requested so that, as below, rows with fewer than 10 fields are rejected.
+        dtype = [('date', 'U32'), ('time', 'U32'), ('E', 'f8'), ('N', 'f8'), ('U', 'f8'), ('check', 'U1')]
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # Empty files
+                table = np.loadtxt(file_path, dtype=dtype, comments=('%', '#'),
+                                   usecols=(0, 1) + sigma_columns + (9,), ndmin=1)
+        except ValueError:
+            # Some lines are short or malformed: fall back to checking line by line
+            self._read_xyz_lines(file_path, sigma_columns)
+            return
+        
+        # Parse timestamp (format: YYYY/MM/DD HH:MM:SS.FFF)
+        self.sigma_values['epochs'] = np.char.add(np.char.add(table['date'], ' '), table['time']).tolist()
+        
+        # Parse sigma values (convert from meters to millimeters), keeping each
+        # component as its own contiguous array
+        for comp in ['E', 'N', 'U']:
+            self.sigma_values[comp] = table[comp] * 1000
+
+    def _read_xyz_lines(self, file_path, sigma_columns):
+        """Parse an XYZ or LLH solution file line by line, skipping lines that can't be parsed."""
+        e_col, n_col, u_col = sigma_columns
         with open(file_path, 'r') as f:
             for line in f:
                 try:
@@ -177,17 +373,9 @@ class NohrTechSigmaCalculator:
                     timestamp = ' '.join(fields[0:2])
                     
                     # Parse sigma values (convert from meters to millimeters)
-                    if is_llh:
-                        # For LLH files: Time LAT LON HEIGHT Q NS sE sN sU dE dN dU AGE AR
-                        # sE, sN, sU are at indices 6, 7, 8 (0-based)
-                        e_sigma = float(fields[6]) * 1000  # Convert to mm
-                        n_sigma = float(fields[7]) * 1000  # Convert to mm
-                        u_sigma = float(fields[8]) * 1000  # Convert to mm
-                    else:
-                        # For XYZ files, sigma values are in columns 7, 8, 9
-                        e_sigma = float(fields[7]) * 1000
-                        n_sigma = float(fields[8]) * 1000
-                        u_sigma = float(fields[9]) * 1000
+                    e_sigma = float(fields[e_col]) * 1000
+                    n_sigma = float(fields[n_col]) * 1000
+                    u_sigma = float(fields[u_col]) * 1000
                     
                     self.sigma_values['epochs'].append(timestamp)
                     self.sigma_values['E'].append(e_sigma)
@@ -200,96 +388,86 @@ class NohrTechSigmaCalculator:
 
     def _read_sbf_file(self):
         """Read and parse SBF observation file using SBFParser."""
-        parser = SBFParser(self.filename)
-        blocks = parser.parse_file()
+        pvt = SBFParser(self.filename).parse_pvt_file()
         
-        for block in blocks:
-            if block['block_name'] == "PVTGeodetic":
-                # Extract timestamp from block
-                timestamp = block['timestamp']
-                
-                # Extract sigma values from the block
-                # Convert to millimeters (assuming input is in meters)
-                e_sigma = block['sigma_east'] * 1000  # Convert to mm
-                n_sigma = block['sigma_north'] * 1000  # Convert to mm
-                u_sigma = block['sigma_up'] * 1000  # Convert to mm
-                
-                self.sigma_values['epochs'].append(timestamp)
-                self.sigma_values['E'].append(e_sigma)
-                self.sigma_values['N'].append(n_sigma)
-                self.sigma_values['U'].append(u_sigma)
+        # Horizontal accuracy is split equally between East and North; convert meters to mm
+        sigma_horizontal = pvt['sigma_horizontal'] * 1000
+        self.sigma_values['epochs'] = pvt['timestamp'].tolist()
+        self.sigma_values['E'] = sigma_horizontal
+        self.sigma_values['N'] = sigma_horizontal.copy()
+        self.sigma_values['U'] = pvt['sigma_up'] * 1000
 
     def calculate_sigma(self):
-        """Calculate receiver position sigma values."""
+        """Calculate receiver position sigma values.
+
+        The results are kept until the next read_file call, so repeated calls
+        return the same dict; callers should not modify it.
+        """
+        if self._cached_results is not None:
+            return self._cached_results
+        
         print("\nCalculating sigma values...")
         
         if not self.sigma_values['epochs']:
             print("No position data found in file")
             return None
 
-        # Calculate horizontal and vertical sigmas for each epoch
-        horizontal_sigmas = []
-        vertical_sigmas = []
-        for i in range(len(self.sigma_values['E'])):
-            # Horizontal sigma (RMS of East and North components)
-            e_sigma = self.sigma_values['E'][i]
-            n_sigma = self.sigma_values['N'][i]
-            h_sigma = np.sqrt((e_sigma**2 + n_sigma**2) / 2)  # RMS of E and N
-            horizontal_sigmas.append(h_sigma)
-            
-            # Vertical sigma (RMS of Up component)
-            u_sigma = self.sigma_values['U'][i]
-            v_sigma = np.sqrt(u_sigma**2)  # RMS of U
-            vertical_sigmas.append(v_sigma)
+        # Calculate horizontal and vertical sigmas for all epochs at once
+        E = np.asarray(self.sigma_values['E'], dtype=np.float64)
+        N = np.asarray(self.sigma_values['N'], dtype=np.float64)
+        U = np.asarray(self.sigma_values['U'], dtype=np.float64)
+        # Square each component once; the squares also feed the RMS values below
+        E2 = E * E
+        N2 = N * N
+        U2 = U * U
+        horizontal_sigmas = np.sqrt(0.5 * (E2 + N2))  # RMS of E and N
+        vertical_sigmas = np.abs(U)  # RMS of a single value, sqrt(U^2) == |U|
 
-        # Create results dictionary with proper structure
+        # Create results dictionary with proper structure; per-epoch entries
+        # are generated from the component arrays when accessed
         results = {
-            'epochs': [],
+            'epochs': EpochResults(self.sigma_values['epochs'], horizontal_sigmas,
+                                   vertical_sigmas, E, N, U),
             'horizontal': horizontal_sigmas,
             'vertical': vertical_sigmas,
-            'E': self.sigma_values['E'],
-            'N': self.sigma_values['N'],
-            'U': self.sigma_values['U']
+            'E': E,
+            'N': N,
+            'U': U
         }
 
-        # Create epoch entries with all components
-        for i in range(len(self.sigma_values['epochs'])):
-            epoch_entry = {
-                'time': self.sigma_values['epochs'][i],
-                'horizontal': horizontal_sigmas[i],
-                'vertical': vertical_sigmas[i],
-                'E': self.sigma_values['E'][i],
-                'N': self.sigma_values['N'][i],
-                'U': self.sigma_values['U'][i]
-            }
-            results['epochs'].append(epoch_entry)
-
         # Calculate overall RMS values
-        rms_horizontal = np.sqrt(np.mean(np.array(horizontal_sigmas)**2))
-        rms_vertical = np.sqrt(np.mean(np.array(vertical_sigmas)**2))
-        rms_e = np.sqrt(np.mean(np.array(self.sigma_values['E'])**2))
-        rms_n = np.sqrt(np.mean(np.array(self.sigma_values['N'])**2))
-        rms_u = np.sqrt(np.mean(np.array(self.sigma_values['U'])**2))
+        mean_e2 = E2.mean()
+        mean_n2 = N2.mean()
+        mean_u2 = U2.mean()
+        rms_horizontal = np.sqrt(0.5 * (mean_e2 + mean_n2))  # mean of horizontal^2
+        rms_vertical = np.sqrt(mean_u2)  # vertical^2 == U^2
+        rms_e = np.sqrt(mean_e2)
+        rms_n = np.sqrt(mean_n2)
+        rms_u = np.sqrt(mean_u2)
 
-        # Calculate summary statistics
+        # Calculate summary statistics for all components at once, one row per component
+        components = ['horizontal', 'vertical', 'E', 'N', 'U']
+        stacked = np.array([horizontal_sigmas, vertical_sigmas, E, N, U], dtype=np.float64)
+        means = stacked.mean(axis=1)
+        # Reuse the means for the standard deviations instead of letting np.std recompute them
+        centered = stacked - means[:, np.newaxis]
+        stds = np.sqrt(np.einsum('ij,ij->i', centered, centered) / stacked.shape[1])
+        mins = stacked.min(axis=1)
+        maxs = stacked.max(axis=1)
+        rms_values = [rms_horizontal, rms_vertical, rms_e, rms_n, rms_u]
+        
         summary = {}
-        for comp, values, rms in [
-            ('horizontal', horizontal_sigmas, rms_horizontal),
-            ('vertical', vertical_sigmas, rms_vertical),
-            ('E', self.sigma_values['E'], rms_e),
-            ('N', self.sigma_values['N'], rms_n),
-            ('U', self.sigma_values['U'], rms_u)
-        ]:
-            values_array = np.array(values)
+        for i, comp in enumerate(components):
             summary[comp] = {
-                'mean': np.mean(values_array),
-                'min': np.min(values_array),
-                'max': np.max(values_array),
-                'std': np.std(values_array),
-                'rms': rms
+                'mean': means[i],
+                'min': mins[i],
+                'max': maxs[i],
+                'std': stds[i],
+                'rms': rms_values[i]
             }
         
         results['summary'] = summary
+        self._cached_results = results
         return results
 
     def calculate_sigma_summary(self, sigma_values):
@@ -298,7 +476,7 @@ class NohrTechSigmaCalculator:
         summary = {}
 
         for comp in components:
-            values = np.array(sigma_values[comp])
+            values = np.asarray(sigma_values[comp])  # No copy when already an array
             summary[comp] = {
                 'mean': f"{np.mean(values):.2f}",
                 'min': f"{np.min(values):.2f}",
@@ -327,15 +505,11 @@ class NohrTechSigmaCalculator:
             "Time", "Horiz(mm)", "Vert(mm)", "E(mm)", "N(mm)", "U(mm)"))
         print("-" * 75)
         
-        for epoch in results['epochs']:
-            print("{:<25} {:10.3f} {:10.3f} {:10.3f} {:10.3f} {:10.3f}".format(
-                str(epoch['time']),
-                epoch['horizontal'],
-                epoch['vertical'],
-                epoch['E'],
-                epoch['N'],
-                epoch['U']
-            ))
+        # Format all rows first and write them with a single print call
+        epochs = results['epochs']
+        row_format = "{:<25} {:10.3f} {:10.3f} {:10.3f} {:10.3f} {:10.3f}".format
+        print("\n".join([row_format(str(time), h, v, e, n, u)
+                         for time, h, v, e, n, u in zip(epochs.times, *epochs.columns())]))
         
         # Print summary statistics
         print("\nSummary Statistics:")
@@ -358,9 +532,11 @@ class NohrTechSigmaCalculator:
     def compare_with(self, other_calculator):
         """Compare this calculator's results with another calculator's results."""
         try:
-            # First read both files
-            self.read_file()
-            other_calculator.read_file()
+            # First read both files, unless their results are already available
+            if self._cached_results is None:
+                self.read_file()
+            if other_calculator._cached_results is None:
+                other_calculator.read_file()
             
             # Calculate sigma values for both files
             results1 = self.calculate_sigma()
@@ -377,54 +553,32 @@ class NohrTechSigmaCalculator:
                 print(f"Error: Could not calculate sigma values for file 2: {other_calculator.filename}")
                 return None
                 
-            comparison = {
-                'file1': {},
-                'file2': {},
-                'differences': {
-                    'horizontal': {},
-                    'vertical': {},
-                    'E': {},
-                    'N': {},
-                    'U': {}
-                }
-            }
+            components = ['horizontal', 'vertical', 'E', 'N', 'U']
+            stats = ['mean', 'rms', 'max', 'std']
             
-            # Store individual file results
-            for comp in ['horizontal', 'vertical', 'E', 'N', 'U']:
-                # File 1 results
-                comparison['file1'][comp] = {
-                    'mean': results1['summary'][comp]['mean'],
-                    'rms': results1['summary'][comp]['rms'],
-                    'max': results1['summary'][comp]['max'],
-                    'std': results1['summary'][comp]['std']
-                }
-                
-                # File 2 results
-                comparison['file2'][comp] = {
-                    'mean': results2['summary'][comp]['mean'],
-                    'rms': results2['summary'][comp]['rms'],
-                    'max': results2['summary'][comp]['max'],
-                    'std': results2['summary'][comp]['std']
-                }
-                
-                # Calculate differences
-                stats1 = results1['summary'][comp]
-                stats2 = results2['summary'][comp]
+            # One row per component, one column per statistic
+            table1 = np.array([[results1['summary'][comp][stat] for stat in stats] for comp in components])
+            table2 = np.array([[results2['summary'][comp][stat] for stat in stats] for comp in components])
+            
+            # Calculate differences and percentage differences for all components at once
+            diffs = table2 - table1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pcts = np.where(table1 != 0, diffs / table1 * 100, np.inf)
+            
+            comparison = {'file1': {}, 'file2': {}, 'differences': {}}
+            for i, comp in enumerate(components):
+                # Store individual file results
+                comparison['file1'][comp] = {stat: results1['summary'][comp][stat] for stat in stats}
+                comparison['file2'][comp] = {stat: results2['summary'][comp][stat] for stat in stats}
                 
                 comparison['differences'][comp] = {
-                    'mean_diff': stats2['mean'] - stats1['mean'],
-                    'rms_diff': stats2['rms'] - stats1['rms'],
-                    'max_diff': stats2['max'] - stats1['max'],
-                    'std_diff': stats2['std'] - stats1['std']
+                    'mean_diff': diffs[i, 0],
+                    'rms_diff': diffs[i, 1],
+                    'max_diff': diffs[i, 2],
+                    'std_diff': diffs[i, 3],
+                    'mean_diff_pct': pcts[i, 0],
+                    'rms_diff_pct': pcts[i, 1]
                 }
-                
-                # Calculate percentage differences
-                comparison['differences'][comp]['mean_diff_pct'] = (
-                    (stats2['mean'] - stats1['mean']) / stats1['mean'] * 100 if stats1['mean'] != 0 else float('inf')
-                )
-                comparison['differences'][comp]['rms_diff_pct'] = (
-                    (stats2['rms'] - stats1['rms']) / stats1['rms'] * 100 if stats1['rms'] != 0 else float('inf')
-                )
             
             return comparison
             
@@ -463,16 +617,82 @@ class NohrTechSigmaCalculator:
                 diff['rms_diff_pct']
             ))
 
+    @classmethod
+    def batch_process(cls, filenames, workers=None, use_cache=False):
+        """Read several files and calculate their sigma values in parallel.
+
+        Each file is handled in its own worker process. Yields a
+        (filename, results, error) tuple per file in the order of filenames,
+        as soon as that file is done. If a file fails, results is None and
+        error is the exception it raised; the other files are still processed.
+        """
+        filenames = list(filenames)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_process_one, filename, use_cache) for filename in filenames]
+            for filename, future in zip(filenames, futures):
+                try:
+                    yield filename, future.result(), None
+                except Exception as e:
+                    yield filename, None, e
+
+def _process_one(filename, use_cache=False):
+    """Read a file and calculate its sigma values (used by batch runs)."""
+    calculator = NohrTechSigmaCalculator(filename)
+    calculator.read_file(use_cache)
+    return calculator.calculate_sigma()
+
+def run_calculation(filename):
+    """Read a file and calculate its sigma values for sending to another process.
+
+    The per-epoch values are returned as a list of times plus one float64
+    array per component rather than one dict per epoch, which keeps the
+    pickle between processes small. Returns None if there is no data.
+    """
+    calculator = NohrTechSigmaCalculator(filename)
+    calculator.read_file()
+    results = calculator.calculate_sigma()
+    if results is None:
+        return None
+    results['times'] = list(results.pop('epochs').times)
+    for key in EpochResults.COMPONENTS:
+        results[key] = np.asarray(results[key], dtype=np.float64)
+    return results
+
+def run_comparison(filename1, filename2):
+    """Compare the sigma values of two files."""
+    return NohrTechSigmaCalculator(filename1).compare_with(NohrTechSigmaCalculator(filename2))
+
 def main():
     """Main function to run the sigma calculator."""
     parser = argparse.ArgumentParser(description='Calculate receiver position sigma values from RINEX, SBF, or XYZ files')
-    parser.add_argument('observation_file', help='Path to the observation file (.rnx, .obs, .sbf, .xyz, or .llh)')
+    parser.add_argument('observation_file', nargs='*', help='Path to the observation file (.rnx, .obs, .sbf, .xyz, or .llh)')
+    parser.add_argument('--glob', help='Also process all files matching this pattern (e.g. "logs/*.llh")')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes when processing several files (default: CPU count)')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse parsed data from a .sigma.npz file next to each input when it is unchanged')
     args = parser.parse_args()
 
-    calculator = NohrTechSigmaCalculator(args.observation_file)
-    calculator.read_file()
-    results = calculator.calculate_sigma()
-    calculator.print_results(results)
+    filenames = list(args.observation_file)
+    if args.glob:
+        filenames.extend(sorted(glob.glob(args.glob)))
+    if not filenames:
+        parser.error('no observation files given')
+
+    if len(filenames) == 1:
+        calculator = NohrTechSigmaCalculator(filenames[0])
+        calculator.read_file(args.cache)
+        results = calculator.calculate_sigma()
+        calculator.print_results(results)
+        return
+
+    # Files are independent, so process them in parallel and print in order
+    for filename, results, error in NohrTechSigmaCalculator.batch_process(filenames, args.workers, args.cache):
+        print(f"\n=== {filename} ===")
+        if error is not None:
+            print(f"Error processing {filename}: {str(error)}")
+            continue
+        NohrTechSigmaCalculator(filename).print_results(results)
 
 if __name__ == "__main__":
     main()
@@ -15,21 +15,39 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from datetime import datetime
+import numpy as np
+
+# Styles are the same for every report, so they are built once at import
+_STYLES = getSampleStyleSheet()
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    spaceAfter=30
+)
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+])
 
 def generate_pdf(output_path, data, filename):
     """Generate a PDF report of sigma calculation results."""
     doc = SimpleDocTemplate(output_path, pagesize=letter)
-    styles = getSampleStyleSheet()
+    styles = _STYLES
     elements = []
 
     # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30
-    )
-    elements.append(Paragraph("RINEX Sigma Calculator Results", title_style))
+    elements.append(Paragraph("RINEX Sigma Calculator Results", _TITLE_STYLE))
     
     # File information
     elements.append(Paragraph(f"File: {filename}", styles["Normal"]))
@@ -42,31 +60,14 @@ def generate_pdf(output_path, data, filename):
     summary_data = [["Component", "Mean (mm)", "Min (mm)", "Max (mm)", "Std Dev (mm)"]]
     components = ['horizontal', 'vertical', 'E', 'N', 'U']
     
-    for comp in components:
-        stats = data['summary']['components'][comp]
-        summary_data.append([
-            comp.capitalize(),
-            f"{stats['mean']:.2f}",
-            f"{stats['min']:.2f}",
-            f"{stats['max']:.2f}",
-            f"{stats['std']:.2f}"
-        ])
+    # Format all statistics in one call, one row per component
+    stats = np.array([[data['summary']['components'][comp][stat] for stat in ('mean', 'min', 'max', 'std')]
+                      for comp in components], dtype=np.float64)
+    for comp, row in zip(components, np.char.mod('%.2f', stats).tolist()):
+        summary_data.append([comp.capitalize()] + row)
     
     summary_table = Table(summary_data, colWidths=[1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch, 1.2*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-    ]))
+    summary_table.setStyle(_TABLE_STYLE)
     elements.append(summary_table)
     elements.append(Spacer(1, 20))
 
@@ -86,20 +87,7 @@ def generate_pdf(output_path, data, filename):
         ])
     
     sat_table = Table(sat_data, colWidths=[1*inch, 1.2*inch, 1.2*inch, 1*inch, 1*inch, 1*inch])
-    sat_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-    ]))
+    sat_table.setStyle(_TABLE_STYLE)
     elements.append(sat_table)
 
     # Build PDF
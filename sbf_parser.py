@@ -9,11 +9,15 @@ extracting position and accuracy information for analysis.
 Author: NohrTech AS
 """
 
-import struct
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+import os
+import mmap
+import logging
+from typing import List, Dict, Tuple
 import math
 import binascii
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 class SBFParser:
     # Block types
@@ -21,6 +25,23 @@ class SBFParser:
     CONFIG_BLOCK = 0x970e    # Configuration block
     PVT_BLOCK = 0x0fa2       # PVTGeodetic block
     
+    # PVTGeodetic body layout (offsets relative to the end of the 8-byte block header).
+    # Accuracies are stored at offsets 92 and 96 from block start.
+    PVT_DTYPE = np.dtype({
+        'names': ['tow', 'week', 'mode', 'error', 'lat', 'lon', 'height', 'h_accuracy', 'v_accuracy'],
+        'formats': ['<u4', '<u2', 'u1', 'u1', '<f8', '<f8', '<f8', '<u4', '<u4'],
+        'offsets': [0, 4, 6, 7, 8, 16, 24, 92 - 8, 96 - 8],
+        'itemsize': 92
+    })
+    
+    # Conversion constants
+    GPS_EPOCH = np.datetime64('1980-01-06T00:00:00', 'us')  # GPS time epoch
+    SECONDS_PER_WEEK = 7 * 24 * 3600
+    SQRT2 = math.sqrt(2)
+    Q24_SCALE = 2.0 ** -24  # Q8.24 fixed point to float
+    TWO_PI = 2 * math.pi
+    HALF_PI = math.pi / 2
+    
     # Satellite system identifiers
     SAT_SYSTEMS = {
         0: 'G',  # GPS
@@ -41,168 +62,168 @@ class SBFParser:
 
     def parse_file(self) -> List[Dict]:
         """Parse the SBF file and return list of blocks."""
+        self.blocks.extend(self._pvt_blocks(self.parse_pvt_file()))
+        return self.blocks
+
+    def parse_data(self, data) -> List[Dict]:
+        """Parse SBF blocks from a buffer (bytes or mmap) and return list of blocks."""
+        self.blocks.extend(self._pvt_blocks(self.parse_pvt_data(data)))
+        return self.blocks
+
+    def parse_pvt_file(self) -> Dict[str, np.ndarray]:
+        """Parse the SBF file and return the decoded PVTGeodetic blocks as arrays.
+
+        See parse_pvt_data for the returned columns.
+        """
         try:
             with open(self.filename, 'rb') as f:
-                data = f.read()
-                
-            print(f"File size: {len(data)} bytes")
-                
-            # Find all sync markers
-            positions = [i for i in range(len(data)-1) if data[i:i+2] == b'$@']
-            print(f"Found {len(positions)} sync markers")
-            
-            for pos in positions:
-                try:
-                    block = self._parse_block(data[pos:])
-                    if block:
-                        print(f"Found block ID: 0x{block['id']:04x} at position {pos}")
-                        processed_block = self._process_block(block)
-                        if processed_block:
-                            self.blocks.append(processed_block)
-                except Exception as e:
-                    print(f"Error processing block at position {pos}: {str(e)}")
-                    continue
-                    
-            print(f"Successfully processed {len(self.blocks)} blocks")
-            return self.blocks
+                if os.fstat(f.fileno()).st_size == 0:
+                    return self.parse_pvt_data(b'')
+                # Map the file instead of reading it so large logs are paged in on demand
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        data.madvise(mmap.MADV_SEQUENTIAL)
+                    return self.parse_pvt_data(data)
         except Exception as e:
             raise ValueError(f"Error parsing SBF file: {str(e)}")
 
-    def _parse_block(self, data: bytes) -> Optional[Dict]:
-        """Parse a single SBF block."""
-        if len(data) < 8:  # Minimum block size
-            return None
+    def parse_pvt_data(self, data) -> Dict[str, np.ndarray]:
+        """Parse SBF blocks from a buffer (bytes or mmap) and return the PVTGeodetic blocks as arrays.
+
+        The result maps 'TOW', 'timestamp', 'mode', 'error', 'lat', 'lon',
+        'height', 'sigma_horizontal' and 'sigma_up' to one array each, with
+        one element per block; sigmas are in meters.
+        """
+        print(f"File size: {len(data)} bytes")
             
-        try:
-            # Skip sync bytes
-            crc = struct.unpack('<H', data[2:4])[0]
-            id_length = struct.unpack('<H', data[4:6])[0]
+        # Find all sync markers
+        positions = []
+        find = data.find
+        pos = find(b'$@')
+        while pos >= 0:
+            positions.append(pos)
+            pos = find(b'$@', pos + 1)
+        print(f"Found {len(positions)} sync markers")
+        
+        pvt_positions = np.empty(0, dtype=np.int64)
+        if positions:
+            positions, block_ids, lengths = self._parse_block_headers(data, positions)
+            if logger.isEnabledFor(logging.DEBUG):
+                for pos, block_id in zip(positions.tolist(), block_ids.tolist()):
+                    logger.debug("Found block ID: 0x%04x at position %d", block_id, pos)
             
-            # Extract block ID and length
-            block_id = id_length & 0x1FFF
-            block_length = id_length >> 13
-            if block_length == 0:
-                block_length = struct.unpack('<H', data[6:8])[0]
+            # Decode all PVTGeodetic blocks at once
+            pvt = block_ids == self.PVT_BLOCK
+            complete = lengths - 8 >= self.PVT_DTYPE.itemsize  # Need at least up to accuracy values
+            for length in lengths[pvt & ~complete].tolist():
+                logger.debug("PVT block too short: %d bytes", length - 8)
+            pvt_positions = positions[pvt & complete]
+        pvt = self._process_pvt_blocks(data, pvt_positions)
                 
-            if block_length < 8 or block_length > len(data):
-                return None
-                
-            return {
-                'id': block_id,
-                'length': block_length,
-                'data': data[8:block_length]  # Skip header bytes
-            }
-        except struct.error:
-            return None
+        print(f"Successfully processed {len(pvt['TOW'])} blocks")
+        return pvt
 
-    def _process_block(self, block: Dict) -> Optional[Dict]:
-        """Process a parsed block based on its ID."""
-        if block['id'] == self.PVT_BLOCK:
-            return self._process_pvt_block(block)
-        return None
+    def _parse_block_headers(self, data, positions: List[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Read the block headers at the given sync positions.
 
-    def _process_pvt_block(self, block: Dict) -> Optional[Dict]:
-        """Process a PVTGeodetic block."""
-        data = block['data']
-        if len(data) < 92:  # Need at least up to accuracy values
-            print(f"PVT block too short: {len(data)} bytes")
-            return None
-            
-        try:
-            # Read header fields
-            tow = struct.unpack('<I', data[0:4])[0] / 1000.0  # Convert ms to seconds
-            week = struct.unpack('<H', data[4:6])[0]
-            mode = data[6]
-            error = data[7]
-            
-            # Read position data (double precision floating point)
-            lat = struct.unpack('<d', data[8:16])[0]  # Latitude in radians
-            lon = struct.unpack('<d', data[16:24])[0]  # Longitude in radians
-            height = struct.unpack('<d', data[24:32])[0]  # Height in meters
-            
-            # Read accuracies
-            # Accuracies are stored at offsets 92 and 96 from block start
-            # The block header is 8 bytes, so we need to subtract that
-            h_accuracy_offset = 92 - 8
-            v_accuracy_offset = 96 - 8
-            
-            # Check if we have enough data for accuracies
-            if len(data) >= v_accuracy_offset + 4:
-                try:
-                    # Read raw bytes
-                    h_raw = data[h_accuracy_offset:h_accuracy_offset+4]
-                    v_raw = data[v_accuracy_offset:v_accuracy_offset+4]
-                    
-                    # Convert from 32-bit unsigned integer format
-                    h_int = int.from_bytes(h_raw, byteorder='little', signed=False)
-                    v_int = int.from_bytes(v_raw, byteorder='little', signed=False)
-                    
-                    # Scale factor: assuming Q8.24 fixed-point format
-                    # Upper 8 bits are integer part, lower 24 bits are fraction
-                    h_accuracy = (h_int >> 24) + ((h_int & 0xFFFFFF) / 16777216.0)  # Convert to meters
-                    v_accuracy = (v_int >> 24) + ((v_int & 0xFFFFFF) / 16777216.0)  # Convert to meters
-                    
-                    print(f"Raw accuracy bytes: h={h_raw.hex()}, v={v_raw.hex()}")
-                    print(f"Integer values: h={h_int}, v={v_int}")
-                    print(f"Converted accuracies (m): h={h_accuracy}, v={v_accuracy}")
-                except (struct.error, ValueError) as e:
-                    print(f"Error parsing accuracies: {str(e)}")
-                    h_accuracy = 0
-                    v_accuracy = 0
-            else:
-                h_accuracy = 0
-                v_accuracy = 0
-            
-            # Convert accuracies to East, North components (approximate)
-            # Horizontal accuracy is split equally between East and North
-            sigma_east = h_accuracy / math.sqrt(2) if h_accuracy > 0 else 0
-            sigma_north = h_accuracy / math.sqrt(2) if h_accuracy > 0 else 0
-            sigma_up = v_accuracy if v_accuracy > 0 else 0
-            
-            # Convert TOW to GPS week seconds
-            gps_epoch = datetime(1980, 1, 6)  # GPS time epoch
-            week_seconds = week * 7 * 24 * 3600
-            timestamp = gps_epoch + timedelta(seconds=week_seconds + tow)
-            
-            # Convert coordinates to degrees
-            # For latitude, first normalize to [-pi/2, pi/2]
-            lat = lat % (2 * math.pi)  # Normalize to [0, 2pi]
-            if lat > math.pi:
-                lat = lat - 2 * math.pi  # Convert to [-pi, pi]
-            if lat > math.pi/2:
-                lat = math.pi - lat  # Convert to [-pi/2, pi/2]
-            elif lat < -math.pi/2:
-                lat = -math.pi - lat  # Convert to [-pi/2, pi/2]
-                
-            # For longitude, normalize to [-pi, pi]
-            lon = lon % (2 * math.pi)  # Normalize to [0, 2pi]
-            if lon > math.pi:
-                lon = lon - 2 * math.pi  # Convert to [-pi, pi]
-            
-            lat_deg = math.degrees(lat)
-            lon_deg = math.degrees(lon)
-            
-            # Print debug info
-            print(f"Block at {block['data'][:8].hex()}")
-            print(f"TOW={tow}, Week={week}, Mode={mode:02x}, Error={error:02x}")
-            print(f"Raw lat={lat}, lon={lon}, height={height}")
-            print(f"Deg lat={lat_deg}, lon={lon_deg}")
-            print(f"Raw accuracies: h={h_accuracy}, v={v_accuracy}")
+        Returns (positions, block_ids, lengths) for the blocks that have a
+        valid length and fit inside the buffer.
+        """
+        buf = np.frombuffer(data, dtype=np.uint8)
+        positions = np.asarray(positions, dtype=np.int64)
+        positions = positions[positions + 8 <= len(buf)]  # Minimum block size
+        
+        # ID/Length word follows the sync bytes and CRC
+        id_length = buf[positions + 4].astype(np.int64) | (buf[positions + 5].astype(np.int64) << 8)
+        block_ids = id_length & 0x1FFF
+        lengths = id_length >> 13
+        explicit = lengths == 0
+        lengths[explicit] = (buf[positions[explicit] + 6].astype(np.int64)
+                             | (buf[positions[explicit] + 7].astype(np.int64) << 8))
+        del buf  # Release the buffer export so an mmap can be closed
+        
+        valid = (lengths >= 8) & (lengths <= len(data) - positions)
+        return positions[valid], block_ids[valid], lengths[valid]
+
+    def _process_pvt_blocks(self, data, positions: np.ndarray) -> Dict[str, np.ndarray]:
+        """Decode the PVTGeodetic blocks starting at the given positions into arrays."""
+        size = self.PVT_DTYPE.itemsize
+        # Copy just the decoded part of each block body (after the 8-byte header) into one record array
+        records = np.frombuffer(b''.join([data[pos + 8:pos + 8 + size] for pos in positions.tolist()]),
+                                dtype=self.PVT_DTYPE)
+        
+        tow = records['tow'] / 1000.0  # Convert ms to seconds
+        week = records['week'].astype(np.int64)
+        
+        # Scale factor: assuming Q8.24 fixed-point format
+        # Upper 8 bits are integer part, lower 24 bits are fraction; a 32-bit
+        # value scaled by 2^-24 is exact in a double, so one multiply does both
+        h_accuracy = records['h_accuracy'] * self.Q24_SCALE  # Convert to meters
+        v_accuracy = records['v_accuracy'] * self.Q24_SCALE  # Convert to meters
+        
+        # Convert accuracies to East, North components (approximate)
+        # Horizontal accuracy is split equally between East and North
+        sigma_horizontal = np.where(h_accuracy > 0, h_accuracy / self.SQRT2, 0.0)
+        sigma_up = np.where(v_accuracy > 0, v_accuracy, 0.0)
+        
+        # Convert TOW to GPS week seconds
+        week_seconds = week * self.SECONDS_PER_WEEK
+        tow_us = records['tow'].astype(np.int64) * 1000
+        timestamps = self.GPS_EPOCH + (week_seconds * 1000000 + tow_us).astype('timedelta64[us]')
+        
+        # Convert coordinates to degrees
+        # For latitude, first normalize to [-pi/2, pi/2]
+        lat = records['lat'] % self.TWO_PI  # Normalize to [0, 2pi]
+        lat = np.where(lat > math.pi, lat - self.TWO_PI, lat)  # Convert to [-pi, pi]
+        lat = np.where(lat > self.HALF_PI, math.pi - lat,
+                       np.where(lat < -self.HALF_PI, -math.pi - lat, lat))  # Convert to [-pi/2, pi/2]
             
-            return {
+        # For longitude, normalize to [-pi, pi]
+        lon = records['lon'] % self.TWO_PI  # Normalize to [0, 2pi]
+        lon = np.where(lon > math.pi, lon - self.TWO_PI, lon)  # Convert to [-pi, pi]
+        
+        lat_deg = np.degrees(lat)
+        lon_deg = np.degrees(lon)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            for i in range(len(records)):
+                logger.debug("TOW=%s, Week=%d, Mode=%02x, Error=%02x",
+                             tow[i], week[i], records['mode'][i], records['error'][i])
+                logger.debug("Raw lat=%s, lon=%s, height=%s", lat[i], lon[i], records['height'][i])
+                logger.debug("Deg lat=%s, lon=%s", lat_deg[i], lon_deg[i])
+                logger.debug("Raw accuracies: h=%s, v=%s", h_accuracy[i], v_accuracy[i])
+        
+        return {
+            'TOW': tow,
+            'timestamp': timestamps,
+            'mode': records['mode'],
+            'error': records['error'],
+            'lat': lat_deg,
+            'lon': lon_deg,
+            'height': records['height'],
+            'sigma_horizontal': sigma_horizontal,
+            'sigma_up': sigma_up
+        }
+
+    @staticmethod
+    def _pvt_blocks(pvt: Dict[str, np.ndarray]) -> List[Dict]:
+        """Build one block dict per PVTGeodetic block from the decoded arrays."""
+        return [
+            {
                 'block_name': 'PVTGeodetic',
-                'TOW': tow,
+                'TOW': block_tow,
                 'timestamp': timestamp,
                 'mode': mode,
                 'error': error,
-                'lat': lat_deg,
-                'lon': lon_deg,
+                'lat': block_lat,
+                'lon': block_lon,
                 'height': height,
-                'sigma_east': sigma_east,
-                'sigma_north': sigma_north,
-                'sigma_up': sigma_up
+                'sigma_east': sigma_h,
+                'sigma_north': sigma_h,
+                'sigma_up': sigma_v
             }
-            
-        except struct.error as e:
-            print(f"Error parsing PVT block: {str(e)}")
-            return None
+            for block_tow, timestamp, mode, error, block_lat, block_lon, height, sigma_h, sigma_v in zip(
+                pvt['TOW'].tolist(), pvt['timestamp'].tolist(), pvt['mode'].tolist(), pvt['error'].tolist(),
+                pvt['lat'].tolist(), pvt['lon'].tolist(), pvt['height'].tolist(),
+                pvt['sigma_horizontal'].tolist(), pvt['sigma_up'].tolist())
+        ]